@@ -1,9 +1,9 @@
-import os
 import json
 import logging
 from datetime import datetime
 from collections import defaultdict
 from typing import Dict, List, Set
+from log_rotation import iter_log_lines
 
 def scan_logs_for_active_users(min_uses: int = 5) -> Dict[int, dict]:
     """
@@ -18,37 +18,30 @@ def scan_logs_for_active_users(min_uses: int = 5) -> Dict[int, dict]:
     log_dir = "logs"
     user_activity = defaultdict(lambda: {"username": "", "search_count": 0, "last_active": None})
 
-    # Scan all log files in the logs directory
-    for filename in os.listdir(log_dir):
-        if not filename.startswith("steel_bot_") or not filename.endswith(".log"):
-            continue
-
-        file_path = os.path.join(log_dir, filename)
-
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if "Search activity:" in line:
-                    try:
-                        # Extract the JSON part of the log line
-                        json_str = line.split("Search activity: ")[1].strip()
-                        activity_data = json.loads(json_str)
-
-                        user_id = activity_data["user_id"]
-                        username = activity_data["username"]
-                        timestamp = activity_data["timestamp"]
-
-                        # Update user activity
-                        user_activity[user_id]["username"] = username
-                        user_activity[user_id]["search_count"] += 1
-
-                        # Update last active timestamp if it's more recent
-                        current_last_active = user_activity[user_id]["last_active"]
-                        if current_last_active is None or timestamp > current_last_active:
-                            user_activity[user_id]["last_active"] = timestamp
-
-                    except (json.JSONDecodeError, KeyError, IndexError) as e:
-                        logging.error(f"Error parsing log line: {e}")
-                        continue
+    # Scan all log files in the logs directory, including gzip-compressed rotated ones
+    for line in iter_log_lines(log_dir):
+        if "Search activity:" in line:
+            try:
+                # Extract the JSON part of the log line
+                json_str = line.split("Search activity: ")[1].strip()
+                activity_data = json.loads(json_str)
+
+                user_id = activity_data["user_id"]
+                username = activity_data["username"]
+                timestamp = activity_data["timestamp"]
+
+                # Update user activity
+                user_activity[user_id]["username"] = username
+                user_activity[user_id]["search_count"] += 1
+
+                # Update last active timestamp if it's more recent
+                current_last_active = user_activity[user_id]["last_active"]
+                if current_last_active is None or timestamp > current_last_active:
+                    user_activity[user_id]["last_active"] = timestamp
+
+            except (json.JSONDecodeError, KeyError, IndexError) as e:
+                logging.error(f"Error parsing log line: {e}")
+                continue
 
     # Filter for active users
     active_users = {
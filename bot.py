@@ -1,4 +1,5 @@
 import os
+import asyncio
 import sqlite3
 import logging
 import json
@@ -10,6 +11,11 @@ from aiogram.filters import Command
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from throttling import ThrottlingMiddleware
+from profiling import Profiler, ProfilingMiddleware, profile_search
+from log_rotation import DailyRotatingFileHandler
+from search_cache import SearchCache
+from prewarm import Prewarmer
 
 # List of elements
 ELEMENTS = ['C', 'Si', 'Mn', 'S', 'P', 'Cr', 'Ni', 'Cu', 'Mo', 'Al', 'Nb', 'V',
@@ -23,13 +29,19 @@ log_directory = "logs"
 if not os.path.exists(log_directory):
     os.makedirs(log_directory)
 
-log_file = os.path.join(log_directory, f"steel_bot_{datetime.now().strftime('%Y%m%d')}.log")
+# Daily steel_bot_YYYYMMDD.log files, rotated at midnight and gzip-compressed once closed
+file_handler = DailyRotatingFileHandler(
+    log_dir=log_directory,
+    retention_days=int(os.getenv("LOG_RETENTION_DAYS", "0")),
+    compress=os.getenv("LOG_COMPRESS", "1") != "0"
+)
+log_file = file_handler.baseFilename
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
+        file_handler,
         logging.StreamHandler()
     ]
 )
@@ -45,6 +57,26 @@ logger.info("=" * 50)
 bot = Bot(token=os.getenv("BOT_TOKEN"))
 dp = Dispatcher()
 
+# Per-user throttling: cheap budget for input updates, strict budget for searches
+throttling = ThrottlingMiddleware(
+    input_rate=float(os.getenv("THROTTLE_INPUT_RATE", "2")),
+    input_burst=int(os.getenv("THROTTLE_INPUT_BURST", "10")),
+    search_rate=float(os.getenv("THROTTLE_SEARCH_RATE", "0.2")),
+    search_burst=int(os.getenv("THROTTLE_SEARCH_BURST", "3"))
+)
+dp.message.middleware(throttling)
+dp.callback_query.middleware(throttling)
+
+# Opt-in profiling, see /profile. Disabled unless PROFILE_SAMPLE_RATE or PROFILE_WINDOW_SECONDS is set
+profiler = Profiler(log_dir=log_directory, sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")))
+if float(os.getenv("PROFILE_WINDOW_SECONDS", "0")) > 0:
+    profiler.start_window(float(os.getenv("PROFILE_WINDOW_SECONDS")))
+dp.message.middleware(ProfilingMiddleware(profiler))
+dp.callback_query.middleware(ProfilingMiddleware(profiler))
+
+# Users allowed to run admin commands
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+
 # Define states for FSM
 class SteelComposition(StatesGroup):
     waiting_for_composition = State()
@@ -81,6 +113,7 @@ def log_search_activity(user_id: int, username: str, composition: Dict[str, floa
     logger.info(f"Search activity: {json.dumps(log_entry, ensure_ascii=False)}")
 
 # Function to find matching steel grades
+@profile_search(profiler)
 def find_matching_steels(composition: Dict[str, float]) -> List[tuple]:
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -126,6 +159,7 @@ def find_matching_steels(composition: Dict[str, float]) -> List[tuple]:
     return results
 
 # Function to find the closest steel grade using Euclidean distance
+@profile_search(profiler)
 def find_closest_steel(composition: Dict[str, float]) -> tuple:
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -177,6 +211,20 @@ def find_closest_steel(composition: Dict[str, float]) -> tuple:
 
     return closest_steel
 
+# Cache of search results, prewarmed on startup from recent search activity
+search_cache = SearchCache(ELEMENTS, max_bytes=int(float(os.getenv("SEARCH_CACHE_MB", "64")) * 1024 * 1024))
+prewarmer = Prewarmer(
+    search_cache,
+    find_matching_steels,
+    find_closest_steel,
+    log_dir=log_directory,
+    lookback_days=int(os.getenv("PREWARM_LOOKBACK_DAYS", "7")),
+    top_n=int(os.getenv("PREWARM_TOP_N", "200")),
+    precision=int(os.getenv("PREWARM_PRECISION", "3")),
+    time_budget=float(os.getenv("PREWARM_TIME_BUDGET", "30")),
+    memory_budget=int(float(os.getenv("PREWARM_MEMORY_MB", "16")) * 1024 * 1024)
+)
+
 
 def create_composition_keyboard(composition: Dict[str, float]) -> InlineKeyboardMarkup:
     keyboard = []
@@ -224,6 +272,36 @@ async def cmd_find(message: Message, state: FSMContext):
     await state.set_state(SteelComposition.waiting_for_composition)
     await message.answer(message_text, reply_markup=keyboard)
 
+@dp.message(Command("profile"))
+async def cmd_profile(message: Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    args = message.text.split()[1:]
+    logger.info(f"Admin profiling command: user_id={message.from_user.id}, args={args}")
+
+    try:
+        if args and args[0] == "on":
+            seconds = float(args[1]) if len(args) > 1 else 60
+            profiler.start_window(seconds)
+            await message.answer(f"Профилирование включено на {seconds:.0f} с.")
+        elif args and args[0] == "rate":
+            profiler.set_rate(float(args[1]))
+            await message.answer(f"Доля профилируемых запросов: {profiler.sample_rate}")
+        elif args and args[0] in ("off", "dump"):
+            prefix = await asyncio.to_thread(profiler.stop if args[0] == "off" else profiler.dump)
+            await message.answer(f"Данные сохранены: {prefix}_*" if prefix else "Нет собранных данных.")
+        else:
+            await message.answer(
+                "Использование:\n"
+                "/profile on [секунды] - профилировать все запросы в течение окна\n"
+                "/profile rate <0..1> - профилировать долю запросов\n"
+                "/profile dump - сохранить собранные данные\n"
+                "/profile off - выключить и сохранить данные\n\n"
+                f"Сейчас: {'включено' if profiler.enabled else 'выключено'}"
+            )
+    except (IndexError, ValueError):
+        await message.answer("Некорректные параметры команды /profile.")
+
 @dp.callback_query(lambda c: c.data.startswith("edit_"))
 async def process_edit(callback_query: CallbackQuery, state: FSMContext):
     element = callback_query.data.split("_")[1]
@@ -267,7 +345,8 @@ async def process_search(callback_query: CallbackQuery, state: FSMContext):
         f"username={callback_query.from_user.username}, composition={composition}")
 
     # Find matching steels
-    matches = find_matching_steels(composition)
+    matches, cache_hit = search_cache.get_or_compute("match", composition, find_matching_steels)
+    prewarmer.observe(composition, cache_hit)
 
     if matches:
         response = "Найдены подходящие марки стали:\n\n"
@@ -316,7 +395,7 @@ async def process_find_closest(callback_query: CallbackQuery, state: FSMContext)
     composition = state_data.get("composition", {})
 
     # Find the closest steel
-    closest = find_closest_steel(composition)
+    closest, _ = search_cache.get_or_compute("closest", composition, find_closest_steel)
 
     if closest:
         steel_grade, specification, db_composition = closest
@@ -469,8 +548,20 @@ async def process_new_search(callback_query: CallbackQuery, state: FSMContext):
 
 async def main():
     logger.info("Bot started")
-    await dp.start_polling(bot)
+    background_tasks = []
+    if os.getenv("PREWARM_ENABLED", "1") != "0":
+        # Prewarm in a worker thread, so polling starts right away
+        background_tasks.append(asyncio.create_task(asyncio.to_thread(prewarmer.run)))
+        background_tasks.append(asyncio.create_task(prewarmer.report_coverage()))
+    try:
+        await dp.start_polling(bot)
+    finally:
+        logger.info(f"Throttling metrics: {throttling.get_metrics()}")
+        await asyncio.to_thread(profiler.stop)
+        # Cancelling the task does not interrupt the worker thread, so stop the prewarm loop too
+        prewarmer.stop()
+        for task in background_tasks:
+            task.cancel()
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
\ No newline at end of file
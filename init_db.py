@@ -1,20 +1,23 @@
+import math
 import sqlite3
+import argparse
+import itertools
 import pandas as pd
 import os
+from typing import Iterator, List, Optional, Tuple
+from openpyxl import load_workbook
 
-def init_database():
-    # Check if the Excel file exists
-    if not os.path.exists('steel_grades.xlsx'):
-        print("Error: steel_grades.xlsx file not found!")
-        print("Please create an Excel file with the following columns:")
-        print("steel_grade, specification, C_min, C_max, Si_min, Si_max, Mn_min, Mn_max, S_min, S_max, P_min, P_max, Cr_min, Cr_max, Ni_min, Ni_max, Cu_min, Cu_max, Mo_min, Mo_max, Al_min, Al_max, Nb_min, Nb_max, V_min, V_max, Ti_min, Ti_max, N_min, N_max, W_min, W_max, B_min, B_max, Co_min, Co_max, Ce_min, Ce_max")
-        return False
+ELEMENTS = ['C', 'Si', 'Mn', 'S', 'P', 'Cr', 'Ni', 'Cu', 'Mo', 'Al', 'Nb', 'V',
+            'Ti', 'N', 'W', 'B', 'Co', 'Ce']
 
-    # Connect to the database
-    conn = sqlite3.connect('steel_database.db')
-    cursor = conn.cursor()
+REQUIRED_COLUMNS = ['steel_grade', 'specification'] + [
+    f"{element}_{bound}" for element in ELEMENTS for bound in ('min', 'max')
+]
 
-    # Create the steel_grades table
+# Streaming mode looks for the header among this many first non-empty rows of a sheet
+HEADER_SEARCH_ROWS = 10
+
+def create_steel_grades_table(cursor):
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS steel_grades (
         steel_grade TEXT,
@@ -58,21 +61,28 @@ def init_database():
     )
     ''')
 
+def init_database():
+    # Check if the Excel file exists
+    if not os.path.exists('steel_grades.xlsx'):
+        print("Error: steel_grades.xlsx file not found!")
+        print("Please create an Excel file with the following columns:")
+        print("steel_grade, specification, C_min, C_max, Si_min, Si_max, Mn_min, Mn_max, S_min, S_max, P_min, P_max, Cr_min, Cr_max, Ni_min, Ni_max, Cu_min, Cu_max, Mo_min, Mo_max, Al_min, Al_max, Nb_min, Nb_max, V_min, V_max, Ti_min, Ti_max, N_min, N_max, W_min, W_max, B_min, B_max, Co_min, Co_max, Ce_min, Ce_max")
+        return False
+
+    # Connect to the database
+    conn = sqlite3.connect('steel_database.db')
+    cursor = conn.cursor()
+
+    # Create the steel_grades table
+    create_steel_grades_table(cursor)
+
     # Read the Excel file
     try:
         df = pd.read_excel('steel_grades.xlsx')
         print('df.columns', df.columns)
 
         # Check if all required columns are present
-        required_columns = [
-            'steel_grade', 'specification',
-            'C_min', 'C_max', 'Si_min', 'Si_max', 'Mn_min', 'Mn_max',
-            'S_min', 'S_max', 'P_min', 'P_max', 'Cr_min', 'Cr_max',
-            'Ni_min', 'Ni_max', 'Cu_min', 'Cu_max', 'Mo_min', 'Mo_max',
-            'Al_min', 'Al_max', 'Nb_min', 'Nb_max', 'V_min', 'V_max',
-            'Ti_min', 'Ti_max', 'N_min', 'N_max', 'W_min', 'W_max',
-            'B_min', 'B_max', 'Co_min', 'Co_max', 'Ce_min', 'Ce_max'
-        ]
+        required_columns = REQUIRED_COLUMNS
 
         missing_columns = [col for col in required_columns if col not in df.columns]
         print('missing_columns', missing_columns)
@@ -101,5 +111,220 @@ def init_database():
     finally:
         conn.close()
 
+def _coerce_number(value) -> Optional[float]:
+    # Empty cells become NULL, numbers stored as text ("0,45" or "0.45") are converted,
+    # NaN and infinities are rejected since SQLite would store NaN as NULL
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"unexpected boolean {value!r}")
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = str(value).strip().replace(',', '.')
+        if not text:
+            return None
+        number = float(text)
+    if not math.isfinite(number):
+        raise ValueError(f"not a finite number {value!r}")
+    return number
+
+def _iter_sheet_rows(worksheet) -> Iterator[Tuple[int, tuple]]:
+    # Yield (row_number, values) for non-empty rows, without materializing the sheet
+    for row_number, values in enumerate(worksheet.iter_rows(values_only=True), start=1):
+        if values is None or all(value is None or str(value).strip() == '' for value in values):
+            continue
+        yield row_number, values
+
+def _find_header(rows: Iterator[Tuple[int, tuple]]) -> Tuple[Optional[List[str]], List[str]]:
+    """
+    Consume rows up to and including the header row, which may be preceded by title rows.
+
+    Args:
+        rows (Iterator[Tuple[int, tuple]]): Non-empty rows of a sheet
+
+    Returns:
+        Tuple[Optional[List[str]], List[str]]: Header cells (None if no header was found within
+        HEADER_SEARCH_ROWS rows) and the required columns missing from the closest candidate row
+    """
+    missing_columns = list(REQUIRED_COLUMNS)
+    for _ in range(HEADER_SEARCH_ROWS):
+        row = next(rows, None)
+        if row is None:
+            break
+        header = [str(value).strip() if value is not None else '' for value in row[1]]
+        missing = [col for col in REQUIRED_COLUMNS if col not in header]
+        if not missing:
+            return header, []
+        if len(missing) < len(missing_columns):
+            missing_columns = missing
+    return None, missing_columns
+
+def validate_row(values: tuple, column_index: List[int]) -> Tuple[Optional[list], List[str]]:
+    """
+    Coerce one worksheet row to the steel_grades column order and validate it.
+
+    Args:
+        values (tuple): Raw cell values of the row
+        column_index (List[int]): Position of every REQUIRED_COLUMNS entry in the row
+
+    Returns:
+        Tuple[Optional[list], List[str]]: Coerced values (None if the row is invalid) and error messages
+    """
+    errors = []
+    record = []
+    for col, idx in zip(REQUIRED_COLUMNS, column_index):
+        value = values[idx] if idx < len(values) else None
+        if col in ('steel_grade', 'specification'):
+            value = str(value).strip() if value is not None else ''
+            if col == 'steel_grade' and not value:
+                errors.append("empty steel_grade")
+            record.append(value)
+            continue
+        try:
+            record.append(_coerce_number(value))
+        except ValueError:
+            errors.append(f"{col}: not a number ({value!r})")
+            record.append(None)
+
+    for i, element in enumerate(ELEMENTS):
+        min_val, max_val = record[2 + i * 2], record[3 + i * 2]
+        if min_val is not None and max_val is not None and min_val > max_val:
+            errors.append(f"{element}_min {min_val} > {element}_max {max_val}")
+
+    return (None if errors else record), errors
+
+def init_database_streaming(excel_file: str = 'steel_grades.xlsx', chunk_size: int = 5000,
+                            errors_file: str = 'init_db_errors.log') -> bool:
+    """
+    Load every sheet of the workbook into steel_grades with bounded memory.
+
+    Rows are read one at a time from a read-only workbook, validated, and inserted in chunks
+    of chunk_size within a single transaction, so a failed import leaves the old data intact.
+    The header may follow a few title rows; sheets without a header (notes, cover pages) are
+    skipped. Invalid and duplicate (steel_grade, specification) rows are skipped as well, and
+    both are reported in errors_file.
+
+    Args:
+        excel_file (str): Path to the Excel workbook
+        chunk_size (int): Number of rows per executemany batch
+        errors_file (str): Path of the per-row error report
+
+    Returns:
+        bool: True if the database was updated
+    """
+    if not os.path.exists(excel_file):
+        print(f"Error: {excel_file} file not found!")
+        return False
+
+    conn = sqlite3.connect('steel_database.db')
+    cursor = conn.cursor()
+    create_steel_grades_table(cursor)
+
+    insert_query = (
+        f"INSERT INTO steel_grades ({', '.join(REQUIRED_COLUMNS)}) "
+        f"VALUES ({', '.join(['?'] * len(REQUIRED_COLUMNS))})"
+    )
+
+    workbook = None
+    inserted = 0
+    error_count = 0
+    skipped_sheets = 0
+    try:
+        workbook = load_workbook(excel_file, read_only=True, data_only=True)
+        with open(errors_file, 'w', encoding='utf-8') as report:
+            cursor.execute("DELETE FROM steel_grades")
+
+            # Duplicate detection lives in a temporary table (on disk by default) instead of
+            # an in-memory set, so memory stays bounded for any number of distinct grades
+            cursor.execute("""
+            CREATE TEMP TABLE seen_grades (
+                steel_grade TEXT,
+                specification TEXT,
+                location TEXT,
+                PRIMARY KEY (steel_grade, specification)
+            )
+            """)
+
+            for worksheet in workbook.worksheets:
+                rows = _iter_sheet_rows(worksheet)
+                first_row = next(rows, None)
+                if first_row is None:
+                    print(f"Sheet '{worksheet.title}': empty, skipped")
+                    continue
+
+                rows = itertools.chain([first_row], rows)
+                header, missing_columns = _find_header(rows)
+                if header is None:
+                    message = f"no header in the first {HEADER_SEARCH_ROWS} rows, sheet skipped"
+                    if len(missing_columns) < len(REQUIRED_COLUMNS):
+                        message += f"; missing columns: {', '.join(missing_columns)}"
+                    print(f"Sheet '{worksheet.title}': {message}")
+                    report.write(f"{worksheet.title}: {message}\n")
+                    skipped_sheets += 1
+                    continue
+                column_index = [header.index(col) for col in REQUIRED_COLUMNS]
+
+                sheet_inserted = 0
+                chunk = []
+                for row_number, values in rows:
+                    record, errors = validate_row(values, column_index)
+                    if record is not None:
+                        cursor.execute(
+                            "INSERT OR IGNORE INTO seen_grades VALUES (?, ?, ?)",
+                            (record[0], record[1], f"{worksheet.title}!{row_number}")
+                        )
+                        if cursor.rowcount == 0:
+                            first_location = cursor.execute(
+                                "SELECT location FROM seen_grades WHERE steel_grade = ? AND specification = ?",
+                                (record[0], record[1])
+                            ).fetchone()[0]
+                            errors.append(f"duplicate of {record[0]} / {record[1]} at {first_location}")
+                            record = None
+
+                    if record is None:
+                        error_count += 1
+                        report.write(f"{worksheet.title}!{row_number}: {'; '.join(errors)}\n")
+                        continue
+
+                    chunk.append(record)
+                    if len(chunk) >= chunk_size:
+                        cursor.executemany(insert_query, chunk)
+                        sheet_inserted += len(chunk)
+                        chunk.clear()
+
+                if chunk:
+                    cursor.executemany(insert_query, chunk)
+                    sheet_inserted += len(chunk)
+
+                inserted += sheet_inserted
+                print(f"Sheet '{worksheet.title}': {sheet_inserted} steel grades loaded")
+
+        conn.commit()
+        print(f"Database updated successfully with {inserted} steel grades from {excel_file}")
+        if error_count or skipped_sheets:
+            print(f"{error_count} rows and {skipped_sheets} sheets were skipped, see {errors_file} for details")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Error reading Excel file: {e}")
+        return False
+    finally:
+        if workbook is not None:
+            workbook.close()
+        conn.close()
+
 if __name__ == "__main__":
-    init_database()
+    parser = argparse.ArgumentParser(description="Load steel grades from Excel into steel_database.db")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream all sheets row by row with validation (for very large workbooks)")
+    parser.add_argument("--file", default="steel_grades.xlsx", help="Excel workbook to load in streaming mode")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per insert batch in streaming mode")
+    parser.add_argument("--errors-file", default="init_db_errors.log", help="per-row error report in streaming mode")
+    args = parser.parse_args()
+
+    if args.stream:
+        init_database_streaming(args.file, args.chunk_size, args.errors_file)
+    else:
+        init_database()
@@ -0,0 +1,196 @@
+import os
+import sys
+import gzip
+import queue
+import shutil
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import IO, Iterator, List, Optional
+
+LOG_PREFIX = "steel_bot_"
+
+def log_file_for(log_dir: str, day: datetime, prefix: str = LOG_PREFIX) -> str:
+    return os.path.join(log_dir, f"{prefix}{day.strftime('%Y%m%d')}.log")
+
+def _file_day(filename: str, prefix: str = LOG_PREFIX) -> Optional[datetime]:
+    # steel_bot_YYYYMMDD.log or steel_bot_YYYYMMDD.log.gz -> date, None for anything else
+    if not filename.startswith(prefix):
+        return None
+    stem = filename[len(prefix):]
+    for suffix in (".log.gz", ".log"):
+        if stem.endswith(suffix):
+            try:
+                return datetime.strptime(stem[:-len(suffix)], "%Y%m%d")
+            except ValueError:
+                return None
+    return None
+
+def list_log_files(log_dir: str = "logs", prefix: str = LOG_PREFIX, since: Optional[datetime] = None) -> List[str]:
+    """
+    List bot log files, plain and gzip-compressed, oldest first.
+
+    While a file is being compressed both steel_bot_X.log and steel_bot_X.log.gz can exist;
+    the plain file is returned in that case so that no day is read twice.
+
+    Args:
+        log_dir (str): Directory with the log files
+        prefix (str): Log file name prefix
+        since (Optional[datetime]): Skip files of days before this date
+
+    Returns:
+        List[str]: Paths of the log files
+    """
+    if not os.path.isdir(log_dir):
+        return []
+    filenames = set(os.listdir(log_dir))
+    log_files = []
+    for filename in sorted(filenames):
+        day = _file_day(filename, prefix)
+        if day is None or (since is not None and day.date() < since.date()):
+            continue
+        if filename.endswith(".gz") and filename[:-len(".gz")] in filenames:
+            continue
+        log_files.append(os.path.join(log_dir, filename))
+    return log_files
+
+def open_log(path: str) -> IO[str]:
+    """
+    Open a plain or gzip-compressed log file for reading text.
+
+    Args:
+        path (str): Path to a .log or .log.gz file
+
+    Returns:
+        IO[str]: Text stream over the file contents
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+def iter_log_lines(log_dir: str = "logs", prefix: str = LOG_PREFIX, since: Optional[datetime] = None) -> Iterator[str]:
+    """
+    Stream the lines of all bot log files, oldest first, decompressing rotated files on the fly.
+
+    Args:
+        log_dir (str): Directory with the log files
+        prefix (str): Log file name prefix
+        since (Optional[datetime]): Skip files of days before this date
+
+    Yields:
+        str: Log lines
+    """
+    for path in list_log_files(log_dir, prefix, since):
+        try:
+            f = open_log(path)
+        except FileNotFoundError:
+            # The compressor replaced X.log with X.log.gz after the listing was taken
+            if path.endswith(".gz"):
+                continue
+            try:
+                f = open_log(f"{path}.gz")
+            except FileNotFoundError:
+                continue
+        with f:
+            yield from f
+
+class DailyRotatingFileHandler(logging.FileHandler):
+    """
+    File handler that writes to logs/steel_bot_YYYYMMDD.log for the current day.
+
+    At midnight the handler switches to the new day's file. Closed files are gzip-compressed
+    by a single background thread, one file at a time in fixed-size chunks. If retention_days
+    is set, only today's file and the files of the last retention_days days are kept; by
+    default logs are kept forever, since active_users.py builds its list from the full history.
+    Plain logs left over from previous runs are compressed on startup.
+    """
+
+    def __init__(self, log_dir: str = "logs", prefix: str = LOG_PREFIX, retention_days: int = 0,
+                 compress: bool = True, compress_level: int = 6, encoding: str = "utf-8"):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.retention_days = retention_days
+        self.compress = compress
+        self.compress_level = compress_level
+
+        now = datetime.now()
+        super().__init__(log_file_for(log_dir, now, prefix), encoding=encoding)
+        self._rollover_at = self._next_midnight(now)
+
+        self._jobs: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._maintenance_loop, name="log-compressor", daemon=True)
+        self._worker.start()
+        self._jobs.put(None)  # Initial pass over files left by previous runs
+
+    @staticmethod
+    def _next_midnight(now: datetime) -> float:
+        return datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).timestamp()
+
+    def emit(self, record: logging.LogRecord):
+        if record.created >= self._rollover_at:
+            self.do_rollover()
+        super().emit(record)
+
+    def do_rollover(self):
+        closed_file = self.baseFilename
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        now = datetime.now()
+        self.baseFilename = os.path.abspath(log_file_for(self.log_dir, now, self.prefix))
+        self._rollover_at = self._next_midnight(now)
+        self.stream = self._open()
+        if closed_file != self.baseFilename:
+            self._jobs.put(closed_file)
+
+    def close(self):
+        # Let the pending compression finish, so no half-written .gz.tmp is left behind
+        if self._worker.is_alive():
+            self._jobs.put(False)
+            self._worker.join(timeout=30)
+        super().close()
+
+    def _maintenance_loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is False:
+                return
+            try:
+                if job is None:
+                    self._compress_stale()
+                elif self.compress:
+                    self._compress_file(job)
+                self._apply_retention()
+            except Exception as e:
+                # Never let log maintenance take the bot or this thread down; report through
+                # stderr only, logging here could recurse into this handler
+                print(f"Log maintenance failed: {e}", file=sys.stderr)
+
+    def _compress_stale(self):
+        if not self.compress:
+            return
+        current = os.path.basename(self.baseFilename)
+        for filename in sorted(os.listdir(self.log_dir)):
+            if filename != current and filename.endswith(".log") and _file_day(filename, self.prefix):
+                self._compress_file(os.path.join(self.log_dir, filename))
+
+    def _compress_file(self, path: str):
+        if not os.path.exists(path) or os.path.abspath(path) == self.baseFilename:
+            return
+        target = f"{path}.gz"
+        tmp = f"{target}.tmp"
+        with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=self.compress_level) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp, target)
+        os.remove(path)
+
+    def _apply_retention(self):
+        if self.retention_days <= 0:
+            return
+        # Keep today's file plus the last retention_days closed days
+        cutoff = datetime.now().date() - timedelta(days=self.retention_days)
+        current = os.path.basename(self.baseFilename)
+        for filename in os.listdir(self.log_dir):
+            day = _file_day(filename, self.prefix)
+            if day is not None and day.date() < cutoff and filename != current:
+                os.remove(os.path.join(self.log_dir, filename))
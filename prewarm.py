@@ -0,0 +1,178 @@
+import json
+import sqlite3
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Set, Tuple
+from log_rotation import iter_log_lines
+from search_cache import SearchCache
+
+logger = logging.getLogger("steel_bot.prewarm")
+
+class Prewarmer:
+    """
+    Fills the search cache with the most frequent compositions from recent search activity.
+
+    The "Search activity:" records written by log_search_activity over the last lookback_days
+    are counted by composition rounded to `precision` decimals. For each of the top_n rounded
+    buckets the exact composition logged most often is searched and cached, since cache keys are
+    exact; most frequent buckets go first, until the time budget or the memory budget runs out. The closest match is only precomputed when there is no exact match, the same way the
+    bot only offers it in that case.
+
+    After report_after seconds the share of searches that hit a prewarmed composition is logged,
+    unless prewarming failed.
+    """
+
+    # Distinct compositions kept while counting, the rarest ones are dropped above this
+    MAX_TRACKED = 50000
+
+    def __init__(self, cache: SearchCache, find_matching: Callable, find_closest: Callable,
+                 log_dir: str = "logs", lookback_days: int = 7, top_n: int = 200, precision: int = 3,
+                 time_budget: float = 30.0, memory_budget: int = 16 * 1024 * 1024,
+                 report_after: float = 3600.0):
+        self.cache = cache
+        self.find_matching = find_matching
+        self.find_closest = find_closest
+        self.log_dir = log_dir
+        self.lookback_days = lookback_days
+        self.top_n = top_n
+        self.precision = precision
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget
+        self.report_after = report_after
+
+        self.prewarmed: Set[Tuple[float, ...]] = set()
+        self.searches = 0
+        self.covered = 0
+        self.failed = False
+        self._observing = True
+        self._stop = threading.Event()
+
+    def stop(self):
+        # Makes a running prewarm return at the next composition or log chunk
+        self._stop.set()
+
+    def quantize(self, composition: Dict[str, float]) -> Tuple[float, ...]:
+        return tuple(round(value, self.precision) for value in self.cache.key(composition))
+
+    def load_frequent_compositions(self, deadline: float) -> List[Tuple[Tuple[float, ...], int]]:
+        """
+        Count recent searches by quantized composition.
+
+        Args:
+            deadline (float): time.monotonic() value after which the log scan stops
+
+        Returns:
+            List[Tuple[Tuple[float, ...], int]]: Up to top_n (exact composition key, bucket count) pairs,
+            most frequent bucket first; the key is the exact composition logged most often in the bucket
+        """
+        since = datetime.now() - timedelta(days=self.lookback_days)
+        counts: Counter = Counter()
+        exact_counts: Dict[Tuple[float, ...], Counter] = {}
+        try:
+            for line_number, line in enumerate(iter_log_lines(self.log_dir, since=since)):
+                if line_number % 10000 == 0:
+                    if self._stop.is_set():
+                        break
+                    if time.monotonic() > deadline:
+                        logger.warning("Prewarm: time budget exhausted while reading logs")
+                        break
+                if "Search activity:" not in line:
+                    continue
+                try:
+                    activity_data = json.loads(line.split("Search activity: ")[1])
+                    exact_key = self.cache.key(activity_data["composition"])
+                    bucket = self.quantize(activity_data["composition"])
+                except (json.JSONDecodeError, KeyError, IndexError, TypeError, ValueError, AttributeError):
+                    continue
+                counts[bucket] += 1
+                exact_counts.setdefault(bucket, Counter())[exact_key] += 1
+                if len(counts) > self.MAX_TRACKED:
+                    counts = Counter(dict(counts.most_common(self.MAX_TRACKED // 2)))
+                    exact_counts = {bucket: exact_counts[bucket] for bucket in counts}
+        except (OSError, EOFError) as e:
+            # Unreadable or truncated log file: prewarm with what has been counted so far
+            logger.error(f"Prewarm: failed to read search activity logs: {e}")
+        return [
+            (exact_counts[bucket].most_common(1)[0][0], count)
+            for bucket, count in counts.most_common(self.top_n)
+        ]
+
+    def run(self) -> Dict[str, float]:
+        """
+        Precompute and cache search results for the most frequent recent compositions.
+        Blocking, meant to be run in a worker thread. Errors are logged, never raised.
+
+        Returns:
+            Dict[str, float]: Number of prewarmed compositions, cache bytes used and elapsed seconds
+        """
+        try:
+            return self._run()
+        except Exception:
+            self.failed = True
+            logger.exception("Prewarm failed")
+            return {"compositions": len(self.prewarmed), "bytes": 0, "elapsed": 0.0}
+
+    def _run(self) -> Dict[str, float]:
+        started = time.monotonic()
+        deadline = started + self.time_budget
+        frequent = self.load_frequent_compositions(deadline)
+        total_searches = sum(count for _, count in frequent)
+
+        used_bytes = 0
+        covered_searches = 0
+        for key, count in frequent:
+            if self._stop.is_set():
+                logger.info("Prewarm: stopped")
+                break
+            if time.monotonic() > deadline:
+                logger.warning("Prewarm: time budget exhausted")
+                break
+            if used_bytes >= self.memory_budget:
+                logger.warning("Prewarm: memory budget exhausted")
+                break
+
+            composition = dict(zip(self.cache.elements, key))
+            try:
+                matches = self.find_matching(composition)
+                used_bytes += self.cache.put("match", composition, matches)
+                if not matches:
+                    used_bytes += self.cache.put("closest", composition, self.find_closest(composition))
+            except sqlite3.Error as e:
+                self.failed = True
+                logger.error(f"Prewarm: search failed, stopping: {e}")
+                break
+
+            self.prewarmed.add(key)
+            covered_searches += count
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Prewarm finished: {len(self.prewarmed)} compositions, ~{used_bytes / 1024:.0f} KiB, "
+            f"{elapsed:.1f} s, covering {covered_searches} of the top {total_searches} logged searches")
+        return {"compositions": len(self.prewarmed), "bytes": used_bytes, "elapsed": elapsed}
+
+    def observe(self, composition: Dict[str, float], cache_hit: bool):
+        # Called for every search until the coverage report is written. A search is covered only
+        # if it was served from the cache for a prewarmed composition, not if it arrived before
+        # the entry was prewarmed or after it had been evicted
+        if not self._observing:
+            return
+        self.searches += 1
+        if cache_hit and self.cache.key(composition) in self.prewarmed:
+            self.covered += 1
+
+    async def report_coverage(self):
+        await asyncio.sleep(self.report_after)
+        self._observing = False
+        if self.failed:
+            logger.warning("Prewarm coverage not reported: prewarm failed, see the errors above")
+            return
+        share = self.covered / self.searches * 100 if self.searches else 0.0
+        logger.info(
+            f"Prewarm coverage over the first {self.report_after / 60:.0f} min: "
+            f"{self.covered} of {self.searches} searches ({share:.1f}%) were served from prewarmed cache entries, "
+            f"cache stats: {self.cache.stats()}")
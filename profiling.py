@@ -0,0 +1,324 @@
+import io
+import os
+import asyncio
+import sys
+import time
+import random
+import pstats
+import cProfile
+import logging
+import threading
+import functools
+import contextvars
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger("steel_bot.profiling")
+
+# Name of the sampled handler in the current asyncio task, used to attribute search calls
+_profiled_handler: contextvars.ContextVar = contextvars.ContextVar("profiled_handler", default=None)
+
+# Allocations made by the profiler itself are left out of the per-handler allocation diff
+_TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, threading.__file__),
+    tracemalloc.Filter(False, __file__),
+]
+
+class Profiler:
+    """
+    Opt-in sampling profiler for bot handlers and search functions.
+
+    Profiling is active either for a fraction of updates (sample_rate) or for every update during
+    a fixed time window (start_window), which is closed by a timer thread. A sampled update runs
+    under cProfile and tracemalloc, while a background thread records the event loop stack every
+    stack_interval seconds as collapsed stacks. Tracing and stack sampling only run while a sampled
+    update is in progress. All samples, including the allocation difference over the update, are
+    attributed to the handler name; search calls are additionally timed through the profile_search
+    decorator.
+
+    Only one update is profiled at a time, since cProfile is per-thread and the event loop thread
+    is shared by all handlers. Coroutines that run on the loop while the sampled handler awaits are
+    recorded too, so the numbers are an upper bound for the handler itself.
+
+    When neither a rate nor a window is set, the middleware and decorators reduce to one attribute
+    check, and no profiler, tracer or thread is running. Outside sampled updates only the window
+    timer may be running.
+    """
+
+    def __init__(self, log_dir: str = "logs", sample_rate: float = 0.0, top_n: int = 25,
+                 stack_interval: float = 0.005, dump_interval: float = 300.0):
+        self.log_dir = log_dir
+        self.sample_rate = sample_rate
+        self.top_n = top_n
+        self.stack_interval = stack_interval
+        self.dump_interval = dump_interval
+        self.window_until = 0.0
+        # Fast-path flag checked on every update, kept in sync by _refresh()
+        self.enabled = sample_rate > 0
+
+        self._current: Optional[str] = None
+        self._loop_thread_id: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._sampler_stop = threading.Event()
+        self._window_timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+        self._reset_data()
+
+    def _reset_data(self):
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._stacks: Counter = Counter()
+        self._search_calls: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self._handler_calls: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self._allocations: Dict[str, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        self._has_data = False
+
+    def set_rate(self, sample_rate: float):
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self._refresh()
+        logger.info(f"Profiling sample rate set to {self.sample_rate}")
+
+    def start_window(self, seconds: float):
+        self._cancel_window_timer()
+        self.window_until = time.monotonic() + seconds
+        self._refresh()
+        # Close the window on time even if no update arrives, and dump outside the event loop
+        self._window_timer = threading.Timer(seconds, self._end_window)
+        self._window_timer.daemon = True
+        self._window_timer.start()
+        logger.info(f"Profiling every update for the next {seconds:.0f} s")
+
+    def _end_window(self):
+        self._window_timer = None
+        self.window_until = 0.0
+        self._refresh()
+        self.dump()
+
+    def _cancel_window_timer(self):
+        if self._window_timer is not None:
+            self._window_timer.cancel()
+            self._window_timer = None
+
+    def stop(self) -> Optional[str]:
+        """
+        Disable profiling and dump whatever has been collected.
+
+        Returns:
+            Optional[str]: Prefix of the dumped files, None if there was nothing to dump
+        """
+        self._cancel_window_timer()
+        self.sample_rate = 0.0
+        self.window_until = 0.0
+        self._refresh()
+        return self.dump()
+
+    def _refresh(self):
+        window_active = time.monotonic() < self.window_until
+        self.enabled = self.sample_rate > 0 or window_active
+        if not self.enabled:
+            self._stop_sampler()
+
+    def _should_sample(self) -> bool:
+        return time.monotonic() < self.window_until or random.random() < self.sample_rate
+
+    async def run(self, name: str, handler: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run one handler call, profiling it if this update is sampled.
+
+        Args:
+            name (str): Handler name the samples are attributed to
+            handler (Callable[[], Awaitable[Any]]): Handler call to run
+
+        Returns:
+            Any: Handler result
+        """
+        if self._current is not None or not self._should_sample():
+            return await handler()
+
+        owns_tracing = not tracemalloc.is_tracing()
+        if owns_tracing:
+            tracemalloc.start()
+        baseline = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (debugger, coverage) already owns this thread
+            if owns_tracing:
+                tracemalloc.stop()
+            return await handler()
+
+        self._current = name
+        token = _profiled_handler.set(name)
+        self._ensure_sampler()
+        started = time.perf_counter()
+        try:
+            return await handler()
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            if owns_tracing:
+                tracemalloc.stop()
+            self._sampler_stop.set()
+            self._current = None
+            _profiled_handler.reset(token)
+            self._record(name, profile, elapsed, snapshot.compare_to(baseline, "lineno"))
+            if time.monotonic() - self._last_dump >= self.dump_interval:
+                await asyncio.to_thread(self.dump)
+
+    def _record(self, name: str, profile: cProfile.Profile, elapsed: float,
+                allocation_diff: List[tracemalloc.StatisticDiff]):
+        with self._lock:
+            allocations = self._allocations[name]
+            for stat in allocation_diff[:self.top_n * 4]:
+                if stat.size_diff or stat.count_diff:
+                    location = allocations[str(stat.traceback)]
+                    location[0] += stat.size_diff
+                    location[1] += stat.count_diff
+            if name in self._stats:
+                self._stats[name].add(profile)
+            else:
+                self._stats[name] = pstats.Stats(profile)
+            self._handler_calls[name][0] += 1
+            self._handler_calls[name][1] += elapsed
+            self._has_data = True
+
+    def record_search(self, func_name: str, elapsed: float):
+        handler_name = _profiled_handler.get()
+        if handler_name is None:
+            # Search from an update that was not sampled
+            return
+        key = f"{handler_name};{func_name}"
+        with self._lock:
+            self._search_calls[key][0] += 1
+            self._search_calls[key][1] += elapsed
+            self._has_data = True
+
+    def _ensure_sampler(self):
+        # The sampler exits shortly after the sampled update ends; reuse it if it is still running
+        self._loop_thread_id = threading.get_ident()
+        self._sampler_stop.clear()
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        self._sampler = threading.Thread(target=self._sample_stacks, name="profiling-sampler", daemon=True)
+        self._sampler.start()
+
+    def _stop_sampler(self):
+        if self._sampler is not None:
+            self._sampler_stop.set()
+            self._sampler.join(timeout=1)
+            self._sampler = None
+
+    def _sample_stacks(self):
+        while not self._sampler_stop.wait(self.stack_interval):
+            current = self._current
+            if current is None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(current)
+            with self._lock:
+                self._stacks[";".join(reversed(stack))] += 1
+                self._has_data = True
+
+    def dump(self) -> Optional[str]:
+        """
+        Write collected samples to the log directory and reset them.
+
+        Files: <prefix>_stacks.txt (collapsed stacks, flamegraph.pl / speedscope format),
+        <prefix>_calls.txt (per-handler cProfile and search call timings),
+        <prefix>_alloc.txt (tracemalloc top-N allocation growth per handler) and
+        <prefix>_<handler>.prof (raw pstats). Writes files, so call it off the event loop.
+
+        Returns:
+            Optional[str]: Prefix of the dumped files, None if there was nothing to dump
+        """
+        self._last_dump = time.monotonic()
+        with self._lock:
+            if not self._has_data:
+                return None
+            stats, stacks = self._stats, self._stacks
+            search_calls, handler_calls = self._search_calls, self._handler_calls
+            allocations = self._allocations
+            self._reset_data()
+
+        prefix = os.path.join(self.log_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+
+        with open(f"{prefix}_stacks.txt", "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with open(f"{prefix}_calls.txt", "w", encoding="utf-8") as f:
+            f.write("Handlers (calls, total s, avg ms):\n")
+            for name, (calls, total) in sorted(handler_calls.items(), key=lambda item: -item[1][1]):
+                f.write(f"  {name}: {calls}, {total:.3f}, {total / calls * 1000:.1f}\n")
+            f.write("\nSearch calls by handler (calls, total s, avg ms):\n")
+            for name, (calls, total) in sorted(search_calls.items(), key=lambda item: -item[1][1]):
+                f.write(f"  {name}: {calls}, {total:.3f}, {total / calls * 1000:.1f}\n")
+            for name, handler_stats in stats.items():
+                stream = io.StringIO()
+                handler_stats.stream = stream
+                handler_stats.sort_stats("cumulative").print_stats(self.top_n)
+                f.write(f"\n===== {name} =====\n{stream.getvalue()}")
+                handler_stats.dump_stats(f"{prefix}_{name}.prof")
+
+        with open(f"{prefix}_alloc.txt", "w", encoding="utf-8") as f:
+            f.write("Memory growth over sampled updates by handler (size, blocks):\n")
+            for name, handler_allocations in allocations.items():
+                f.write(f"\n===== {name} =====\n")
+                top = sorted(handler_allocations.items(), key=lambda item: -item[1][0])[:self.top_n]
+                for location, (size, count) in top:
+                    f.write(f"{location}: {size / 1024:+.1f} KiB, {count:+d}\n")
+
+        logger.info(f"Profiling data dumped to {prefix}_*")
+        return prefix
+
+class ProfilingMiddleware(BaseMiddleware):
+    """
+    Inner middleware that hands sampled updates to the Profiler, keyed by handler function name.
+    """
+
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.profiler.enabled:
+            return await handler(event, data)
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", type(event).__name__)
+        return await self.profiler.run(name, lambda: handler(event, data))
+
+def profile_search(profiler: Profiler):
+    """
+    Decorator that times a search function while profiling is enabled.
+
+    Args:
+        profiler (Profiler): Profiler the timings are reported to
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record_search(func.__name__, time.perf_counter() - started)
+        return wrapper
+    return decorator
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+def _estimate_size(value: Any) -> int:
+    # Rough deep size of search results: tuples of strings/floats and a composition dict
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(item) for item in value)
+    return size
+
+class SearchCache:
+    """
+    Thread-safe LRU cache for search results, bounded by an estimated size in bytes.
+
+    Keys are the full composition vector, so a cached result is always identical to what the
+    search would return. The cache is cleared whenever the database file changes, e.g. after
+    init_db.py has been run while the bot is up.
+    """
+
+    def __init__(self, elements: List[str], max_bytes: int = 64 * 1024 * 1024,
+                 db_path: str = 'steel_database.db'):
+        self.elements = elements
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[Tuple[str, Tuple[float, ...]], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_mtime = self._get_db_mtime()
+
+    def key(self, composition: Dict[str, float]) -> Tuple[float, ...]:
+        return tuple(float(composition.get(element, 0) or 0) for element in self.elements)
+
+    def _get_db_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.db_path)
+        except OSError:
+            return None
+
+    def _check_db(self):
+        db_mtime = self._get_db_mtime()
+        if db_mtime != self._db_mtime:
+            self._entries.clear()
+            self.size = 0
+            self._db_mtime = db_mtime
+
+    def get_or_compute(self, kind: str, composition: Dict[str, float],
+                       compute: Callable[[Dict[str, float]], Any]) -> Tuple[Any, bool]:
+        """
+        Return the cached result of compute(composition), computing and storing it on a miss.
+
+        Args:
+            kind (str): Search type, e.g. "match" or "closest"
+            composition (Dict[str, float]): Chemical composition
+            compute (Callable[[Dict[str, float]], Any]): Search function
+
+        Returns:
+            Tuple[Any, bool]: Search result and whether it came from the cache
+        """
+        entry_key = (kind, self.key(composition))
+        with self._lock:
+            self._check_db()
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return entry[0], True
+            self.misses += 1
+
+        result = compute(composition)
+        self.put(kind, composition, result)
+        return result, False
+
+    def put(self, kind: str, composition: Dict[str, float], result: Any) -> int:
+        """
+        Store a search result, evicting least recently used entries to stay within max_bytes.
+
+        Returns:
+            int: Estimated size of the stored entry in bytes (0 if it was too large to store)
+        """
+        entry_key = (kind, self.key(composition))
+        entry_size = _estimate_size(entry_key) + _estimate_size(result)
+        if entry_size > self.max_bytes:
+            return 0
+
+        with self._lock:
+            old = self._entries.pop(entry_key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[entry_key] = (result, entry_size)
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+        return entry_size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
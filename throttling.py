@@ -0,0 +1,174 @@
+import time
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, CallbackQuery
+
+logger = logging.getLogger("steel_bot.throttling")
+
+# Callbacks that trigger a database scan in find_matching_steels / find_closest_steel
+SEARCH_CALLBACKS = {"search", "find_closest"}
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills at `rate` tokens per second.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self, now: float, amount: float = 1.0) -> bool:
+        """
+        Refill the bucket up to `now` and try to take `amount` tokens from it.
+
+        Args:
+            now (float): Current monotonic time
+            amount (float): Number of tokens to take
+
+        Returns:
+            bool: True if the tokens were taken, False if the bucket is empty
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Per-user rate limiting for messages and callback queries.
+
+    Every user gets two token buckets: a cheap one for input updates (messages, element edits,
+    navigation buttons) and a stricter one for the "search"/"find_closest" callbacks, which scan
+    the steel_grades table. A search that is already running for the same user and composition
+    is not started again: the duplicate callback is answered and dropped.
+
+    Must be registered as an inner middleware (dp.message / dp.callback_query), so that the
+    FSM context is available in `data["state"]`.
+    """
+
+    def __init__(
+        self,
+        input_rate: float = 2.0,
+        input_burst: int = 10,
+        search_rate: float = 0.2,
+        search_burst: int = 3,
+        idle_ttl: float = 600.0,
+    ):
+        self.input_rate = input_rate
+        self.input_burst = input_burst
+        self.search_rate = search_rate
+        self.search_burst = search_burst
+        self.idle_ttl = idle_ttl
+
+        self._input_buckets: Dict[int, TokenBucket] = {}
+        self._search_buckets: Dict[int, TokenBucket] = {}
+        self._in_flight: Set[Tuple[int, str, Tuple[Tuple[str, float], ...]]] = set()
+        self._last_prune = time.monotonic()
+        self.metrics: Counter = Counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        self._prune(now)
+
+        is_search = isinstance(event, CallbackQuery) and event.data in SEARCH_CALLBACKS
+        if not is_search:
+            bucket = self._get_bucket(self._input_buckets, user.id, self.input_rate, self.input_burst)
+            if not bucket.consume(now):
+                self.metrics["rejected_input"] += 1
+                logger.warning(f"Throttled input update: user_id={user.id}, username={user.username}")
+                await self._reject(event)
+                return None
+            self.metrics["passed_input"] += 1
+            return await handler(event, data)
+
+        key = await self._search_key(user.id, event.data, data)
+        if key in self._in_flight:
+            self.metrics["coalesced_search"] += 1
+            logger.info(f"Coalesced duplicate search: user_id={user.id}, username={user.username}, action={event.data}")
+            await event.answer()
+            return None
+
+        bucket = self._get_bucket(self._search_buckets, user.id, self.search_rate, self.search_burst)
+        if not bucket.consume(now):
+            self.metrics["rejected_search"] += 1
+            logger.warning(f"Throttled search: user_id={user.id}, username={user.username}, action={event.data}")
+            await self._reject(event)
+            return None
+
+        self.metrics["passed_search"] += 1
+        self._in_flight.add(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
+
+    def get_metrics(self) -> Dict[str, int]:
+        """
+        Return a snapshot of the throttling counters.
+
+        Returns:
+            Dict[str, int]: passed/rejected/coalesced counters plus the number of tracked users
+        """
+        snapshot = dict(self.metrics)
+        snapshot["tracked_users"] = len(self._input_buckets.keys() | self._search_buckets.keys())
+        snapshot["in_flight_searches"] = len(self._in_flight)
+        return snapshot
+
+    @staticmethod
+    def _get_bucket(buckets: Dict[int, TokenBucket], user_id: int, rate: float, capacity: float) -> TokenBucket:
+        bucket = buckets.get(user_id)
+        if bucket is None:
+            bucket = buckets[user_id] = TokenBucket(rate, capacity)
+        return bucket
+
+    @staticmethod
+    async def _search_key(user_id: int, action: str, data: Dict[str, Any]) -> Tuple[int, str, Tuple[Tuple[str, float], ...]]:
+        state = data.get("state")
+        composition: Dict[str, float] = {}
+        if state is not None:
+            state_data = await state.get_data()
+            composition = state_data.get("composition", {})
+        return user_id, action, tuple(sorted(composition.items()))
+
+    @staticmethod
+    async def _reject(event: TelegramObject):
+        # Spammed messages are dropped silently, answering each of them would only amplify the flood
+        if isinstance(event, CallbackQuery):
+            await event.answer(
+                "Слишком много запросов. Пожалуйста, подождите немного и попробуйте снова.",
+                show_alert=True
+            )
+
+    def _prune(self, now: float):
+        # Drop buckets of users that have been idle long enough for them to refill completely
+        if now - self._last_prune < self.idle_ttl:
+            return
+        self._last_prune = now
+        for buckets in (self._input_buckets, self._search_buckets):
+            stale = [
+                user_id for user_id, bucket in buckets.items()
+                if now - bucket.updated > self.idle_ttl and bucket.is_full(now)
+            ]
+            for user_id in stale:
+                del buckets[user_id]
+        logger.info(f"Throttling metrics: {self.get_metrics()}")